@@ -3,37 +3,68 @@ AI Ad Detection API Server
 Provides ML-based ad detection for the Chrome extension
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask_compress import Compress
 from flask_cors import CORS
 import numpy as np
-import pickle
+import joblib
+import orjson
 import os
-from typing import List, Dict
+from functools import lru_cache
+from itertools import repeat
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from typing import Any, List, Dict
+
+from flat_forest import FlatForest
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from Chrome extension
 
+# Gzip JSON responses over 1KB (prediction lists compress very well)
+app.config['COMPRESS_ALGORITHM'] = 'gzip'
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
 # Load the trained model
 MODEL_PATH = 'ad_detector_model.pkl'
 model = None
+predictor = None  # Object whose predict_proba serves /predict
+
+# Feature encodings shared by every request
+SOURCE_MAP = {'none': 0, 'text': 1, 'class': 2, 'id': 3}
+TAG_SCORES = {'IFRAME': 3, 'DIV': 2, 'IMG': 1, 'SECTION': 1, 'ASIDE': 1}
+
+# Minimum ad-class confidence (percent) for an element to be flagged as an ad
+CONFIDENCE_THRESHOLD = 80
 
 def load_model():
     """Load the trained model from disk"""
-    global model
+    global model, predictor
     if os.path.exists(MODEL_PATH):
-        with open(MODEL_PATH, 'rb') as f:
-            model = pickle.load(f)
+        model = joblib.load(MODEL_PATH)
+        # Tree forests are served from flattened node arrays, which avoids
+        # sklearn's per-tree Python overhead; anything else is used as-is
+        if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+            predictor = FlatForest(model)
+        else:
+            predictor = model
         print(f"✓ Model loaded from {MODEL_PATH}")
     else:
         print(f"✗ Model not found at {MODEL_PATH}. Please train the model first.")
         
 load_model()
 
-def extract_features(candidate: Dict) -> np.ndarray:
+def candidate_column(candidates: List[Dict], key: str, default: Any = 0, dtype=np.float32) -> np.ndarray:
+    """Read one field from every candidate into a typed array"""
+    # map(dict.get, ...) iterates in C, avoiding a generator frame per candidate
+    values = map(dict.get, candidates, repeat(key), repeat(default))
+    return np.fromiter(values, dtype=dtype, count=len(candidates))
+
+def extract_features_batch(candidates: List[Dict]) -> np.ndarray:
     """
-    Extract numerical features from a candidate element
+    Extract numerical features for a whole batch of candidate elements
     
-    Features:
+    Features (one column each):
     1. keyWordHit (0/1)
     2. isIframe (0/1)
     3. width
@@ -44,67 +75,95 @@ def extract_features(candidate: Dict) -> np.ndarray:
     8. is_banner_sized (0/1) - typical banner dimensions
     9. is_large_area (0/1) - >100k pixels
     10. tag_score (iframe=3, div=2, img=1, other=0)
+    
+    Returns:
+        X: Feature matrix (n_candidates, 10 features)
     """
     
-    features = []
+    n = len(candidates)
+    
+    # One contiguous float32 buffer, filled column by column
+    X = np.empty((n, 10), dtype=np.float32)
     
     # Binary features
-    features.append(1 if candidate.get('keyWordHit') else 0)
-    features.append(1 if candidate.get('isIframe') else 0)
+    X[:, 0] = candidate_column(candidates, 'keyWordHit', False, dtype=bool)
+    X[:, 1] = candidate_column(candidates, 'isIframe', False, dtype=bool)
     
     # Dimension features
-    width = candidate.get('width', 0)
-    height = candidate.get('height', 0)
-    area = candidate.get('area', 0)
-    
-    features.append(width)
-    features.append(height)
-    features.append(area)
+    X[:, 2] = candidate_column(candidates, 'width')
+    X[:, 3] = candidate_column(candidates, 'height')
+    X[:, 4] = candidate_column(candidates, 'area')
+    width, height, area = X[:, 2], X[:, 3], X[:, 4]
     
     # Keyword source importance (ID is strongest signal)
-    source = candidate.get('keyWordSource', None)
-    source_map = {'none': 0, 'text': 1, 'class': 2, 'id': 3}
-    features.append(source_map.get(source, 0))
+    sources = map(dict.get, candidates, repeat('keyWordSource'))
+    X[:, 5] = np.fromiter(map(SOURCE_MAP.get, sources, repeat(0)), dtype=np.int8, count=n)
     
-    # Aspect ratio (banner ads are often wide)
-    aspect_ratio = width / height if height > 0 else 0
-    features.append(min(aspect_ratio, 10))  # Cap at 10
+    # Aspect ratio (banner ads are often wide), capped at 10
+    aspect_ratio = X[:, 6]
+    aspect_ratio.fill(0)
+    np.divide(width, height, out=aspect_ratio, where=height > 0)
+    np.minimum(aspect_ratio, 10, out=aspect_ratio)
     
     # Banner-sized detection (common ad dimensions)
-    is_banner = (
-        (width >= 728 and height >= 90) or  # Leaderboard
-        (width >= 300 and height >= 250) or  # Medium rectangle
-        (width >= 160 and height >= 600) or  # Wide skyscraper
-        (width >= 320 and height >= 50)      # Mobile banner
+    X[:, 7] = (
+        ((width >= 728) & (height >= 90)) |  # Leaderboard
+        ((width >= 300) & (height >= 250)) |  # Medium rectangle
+        ((width >= 160) & (height >= 600)) |  # Wide skyscraper
+        ((width >= 320) & (height >= 50))     # Mobile banner
     )
-    features.append(1 if is_banner else 0)
     
     # Large area (ads are often sizable)
-    features.append(1 if area > 100000 else 0)
+    X[:, 8] = area > 100000
     
     # Tag importance
-    tag = candidate.get('tag', '').upper()
-    tag_scores = {'IFRAME': 3, 'DIV': 2, 'IMG': 1, 'SECTION': 1, 'ASIDE': 1}
-    features.append(tag_scores.get(tag, 0))
+    tags = map(str.upper, map(dict.get, candidates, repeat('tag'), repeat('')))
+    X[:, 9] = np.fromiter(map(TAG_SCORES.get, tags, repeat(0)), dtype=np.int8, count=n)
     
-    return np.array(features)
+    return X
+
+def unique_feature_rows(X: np.ndarray):
+    """
+    Find the distinct rows of a C-contiguous feature matrix
+    
+    Returns:
+        first: index of the first occurrence of each distinct row
+        inverse: for every row of X, its position in `first`
+    """
+    # View each row as one opaque byte string so np.unique compares whole rows
+    rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+def json_response(payload: Dict) -> Response:
+    """Serialize a response body with orjson (much faster than jsonify for large batches)"""
+    return Response(orjson.dumps(payload), mimetype='application/json')
 
 def create_selector(candidate: Dict) -> str:
     """Create a CSS selector for the element"""
-    elem_id = candidate.get('id', '').strip()
-    class_list = candidate.get('classList', '').strip()
+    return build_selector(
+        candidate.get('id', ''),
+        candidate.get('classList', ''),
+        candidate.get('tag', 'div')
+    )
+
+@lru_cache(maxsize=8192)
+def build_selector(elem_id: str, class_list: str, tag: str) -> str:
+    """
+    Build a selector from the raw id/classList/tag strings
     
-    if elem_id:
-        return f"#{elem_id}"
-    elif class_list:
-        # Take first class for simplicity
-        first_class = class_list.split()[0] if class_list else ''
-        if first_class:
-            return f".{first_class}"
+    Cached because the extension re-sends the same elements whenever a page
+    is reloaded or rescanned.
+    """
+    # isspace() is False for '', so blank values skip the strip/split entirely
+    if elem_id and not elem_id.isspace():
+        return f"#{elem_id.strip()}"
+    elif class_list and not class_list.isspace():
+        # Take first class for simplicity (maxsplit=1 avoids splitting the rest)
+        return f".{class_list.split(None, 1)[0]}"
     
     # Fallback to tag
-    tag = candidate.get('tag', 'div').lower()
-    return tag
+    return tag.lower()
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -158,48 +217,72 @@ def predict():
         }), 500
     
     try:
-        data = request.get_json()
+        try:
+            data = orjson.loads(request.get_data())
+        except orjson.JSONDecodeError:
+            return jsonify({
+                'error': 'Request body is not valid JSON'
+            }), 400
         
-        if not data or 'adCandidates' not in data:
+        if not isinstance(data, dict) or 'adCandidates' not in data:
             return jsonify({
                 'error': 'Missing adCandidates in request body'
             }), 400
         
         candidates = data['adCandidates']
         
+        if not isinstance(candidates, list) or not all(isinstance(c, dict) for c in candidates):
+            return jsonify({
+                'error': 'adCandidates must be a list of objects'
+            }), 400
+        
         if not candidates:
-            return jsonify({'predictions': []})
+            return json_response({'predictions': []})
         
-        # Extract features for all candidates
-        features_list = []
-        for candidate in candidates:
-            features = extract_features(candidate)
-            features_list.append(features)
+        # Extract features for all candidates in one batch
+        try:
+            X = extract_features_batch(candidates)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'error': f'Invalid adCandidates: {str(e)}'
+            }), 400
         
-        X = np.array(features_list)
+        # Validate the dimension columns (width, height, area) all at once
+        dimensions = X[:, 2:5]
+        if not np.isfinite(dimensions).all() or (dimensions < 0).any():
+            return jsonify({
+                'error': 'Candidate width, height and area must be non-negative numbers'
+            }), 400
+        
+        # Pages repeat identical elements (hidden 0x0 nodes, repeated widgets),
+        # so score each distinct feature row once and scatter the results back
+        first, inverse = unique_feature_rows(X)
+        
+        # Get probabilities (isAd is thresholded from these, so a separate
+        # model.predict call would only walk the forest a second time)
+        probabilities = predictor.predict_proba(X[first])[inverse]
         
-        # Get predictions and probabilities
-        predictions = model.predict(X)
-        probabilities = model.predict_proba(X)
+        # proba[:, 1] is the probability of being an ad (class 1)
+        confidence = (probabilities[:, 1] * 100).astype(np.int32)
+        is_ad = confidence >= CONFIDENCE_THRESHOLD
         
-        # Build response
-        results = []
-        for idx, (pred, proba) in enumerate(zip(predictions, probabilities)):
-            # proba[1] is the probability of being an ad (class 1)
-            confidence = int(proba[1] * 100)
-            is_ad = confidence >= 80  # Threshold at 80%
-            
-            results.append({
+        # Build response from plain Python scalars
+        confidences = confidence.tolist()
+        ads = is_ad.tolist()
+        results = [
+            {
                 'index': idx,
-                'isAd': bool(is_ad),
-                'confidence': confidence,
-                'selector': create_selector(candidates[idx])
-            })
+                'isAd': ads[idx],
+                'confidence': confidences[idx],
+                'selector': create_selector(candidate)
+            }
+            for idx, candidate in enumerate(candidates)
+        ]
         
-        return jsonify({
+        return json_response({
             'predictions': results,
             'total_scanned': len(candidates),
-            'ads_detected': sum(1 for r in results if r['isAd'])
+            'ads_detected': int(is_ad.sum())
         })
         
     except Exception as e:
@@ -232,5 +315,8 @@ if __name__ == '__main__':
     print("  GET  /health        - Health check")
     print("  POST /reload-model  - Reload model from disk")
     print("=" * 60)
+    print("Development server only. For concurrent requests run:")
+    print("  gunicorn api_server:app   (settings in gunicorn.conf.py)")
+    print("=" * 60)
     
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Flattened Forest Inference
+Evaluates a trained sklearn tree forest with a handful of numpy operations
+"""
+
+import numpy as np
+
+class FlatForest:
+    """
+    Packs every tree of a binary RandomForest/ExtraTrees classifier into
+    shared node arrays
+
+    sklearn's predict_proba walks the forest one tree at a time, paying
+    Python-level dispatch and input validation per tree. Here all trees step
+    down one level together per numpy operation, so a request costs
+    max_depth iterations regardless of how many trees the forest has.
+    """
+
+    def __init__(self, model):
+        if len(model.classes_) != 2:
+            raise ValueError("FlatForest only supports binary classifiers")
+
+        children, features, thresholds, ad_proba, roots = [], [], [], [], []
+        offset = 0
+        self.depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point back at themselves and never go right, so rows that
+            # reach a leaf early simply stay there for the remaining steps
+            left = np.where(is_leaf, nodes, tree.children_left) + offset
+            right = np.where(is_leaf, nodes, tree.children_right) + offset
+            children.append(np.column_stack([left, right]))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+
+            # Per-node probability of class 1 (values may be counts or fractions)
+            value = tree.value[:, 0, :]
+            ad_proba.append(value[:, 1] / value.sum(axis=1))
+
+            roots.append(offset)
+            offset += tree.node_count
+            self.depth = max(self.depth, tree.max_depth)
+
+        # children[2 * node + go_right] is the next node
+        self.children = np.concatenate(children).ravel().astype(np.intp)
+        self.features = np.concatenate(features).astype(np.intp)
+        self.thresholds = self.float32_thresholds(np.concatenate(thresholds))
+        self.ad_proba = np.concatenate(ad_proba)
+        self.roots = np.array(roots, dtype=np.intp)
+
+    @staticmethod
+    def float32_thresholds(thresholds: np.ndarray) -> np.ndarray:
+        """
+        Round float64 split thresholds down to float32
+
+        sklearn compares float32 features against float64 thresholds. For any
+        float32 x, x > t holds exactly when x > (largest float32 <= t), so the
+        rounded thresholds give identical splits with half the memory traffic.
+        """
+        rounded = thresholds.astype(np.float32)
+        too_high = rounded > thresholds
+        rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+        return rounded
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Same output as the forest's predict_proba: (n_samples, 2)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+
+        # One current node per (tree, sample) pair
+        node = np.repeat(self.roots[:, None], n_samples, axis=1)
+        flat_X = X.ravel()
+        row_offsets = np.arange(n_samples) * n_features
+
+        for _ in range(self.depth):
+            go_right = flat_X[row_offsets + self.features[node]] > self.thresholds[node]
+            node = self.children[2 * node + go_right]
+
+        proba = self.ad_proba[node].mean(axis=0)
+        return np.column_stack([1 - proba, proba])
@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the AI Ad Detection API
+Run from this directory: gunicorn api_server:app
+"""
+
+import multiprocessing
+
+bind = '0.0.0.0:8000'
+
+# Inference is CPU-bound numpy code, so parallelism comes from one worker
+# process per core. Async workers (gevent/eventlet) only help with I/O-bound
+# handlers and would not speed up predictions here.
+workers = multiprocessing.cpu_count()
+
+# gthread with a single thread still runs one request at a time per worker,
+# but unlike the sync worker it supports keep-alive, so the extension can
+# reuse its connection across /predict calls
+worker_class = 'gthread'
+threads = 1
+keepalive = 30
+
+# Load the app (and the pickled model) once in the master process, then fork.
+# Workers share the model's memory copy-on-write instead of each loading it.
+preload_app = True
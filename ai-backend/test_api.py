@@ -192,6 +192,45 @@ def test_predict():
     
     print()
 
+def test_compression():
+    """Test that large /predict responses are gzip-compressed"""
+    print("=" * 60)
+    print("Testing response compression...")
+    print("=" * 60)
+    
+    # Enough candidates to push the response over the 1KB compression threshold
+    candidate = {
+        'keyWordHit': True,
+        'keyWordSource': 'class',
+        'keyWordMatch': 'ad-banner',
+        'isIframe': False,
+        'tag': 'DIV',
+        'id': '',
+        'classList': 'ad-banner sidebar',
+        'width': 300,
+        'height': 250,
+        'area': 75000
+    }
+    payload = {'adCandidates': [candidate] * 50}
+    
+    try:
+        response = requests.post(
+            f'{API_URL}/predict',
+            json=payload,
+            headers={'Accept-Encoding': 'gzip'}
+        )
+        encoding = response.headers.get('Content-Encoding')
+        print(f"Content-Encoding: {encoding}")
+        
+        if encoding == 'gzip':
+            print("✓ Compression check passed\n")
+            return True
+        print("✗ Response was not gzip-compressed\n")
+        return False
+    except Exception as e:
+        print(f"✗ Compression check failed: {e}\n")
+        return False
+
 def main():
     print("\n")
     print("=" * 60)
@@ -208,6 +247,9 @@ def main():
     # Test predictions
     test_predict()
     
+    # Test response compression
+    test_compression()
+    
     print("=" * 60)
     print("Testing Complete!")
     print("=" * 60)